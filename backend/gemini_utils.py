@@ -1,25 +1,52 @@
 from dotenv import load_dotenv
+import functools
 import os
-import google.generativeai as genai
+import numpy as np
 
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini with your API key
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+
+@functools.cache
+def _get_genai():
+    """Imports and configures the Gemini SDK on first use, so importing this module is free"""
+    import google.generativeai as genai
+
+    # Configure Gemini with your API key
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai
+
+
+@functools.cache
+def _get_model():
+    """Returns the shared Gemini Pro model"""
+    return _get_genai().GenerativeModel("gemini-pro")
 
 
 # ---------- Text Generation ----------
 def generate_answer(prompt):
     """Generates text response from Gemini Pro model"""
-    model = genai.GenerativeModel("gemini-pro")
-    response = model.generate_content(prompt)
+    response = _get_model().generate_content(prompt)
     return response.text
 
 
+def generate_answer_stream(prompt):
+    """Yields the Gemini Pro response text incrementally as it is generated"""
+    for chunk in _get_model().generate_content(prompt, stream=True):
+        if chunk.text:
+            yield chunk.text
+
+
 # ---------- Embeddings ----------
 def get_embedding(text):
     """Generates vector embedding for given text"""
     embed_model = "models/embedding-001"
-    embedding = genai.embed_content(model=embed_model, content=text)
+    embedding = _get_genai().embed_content(model=embed_model, content=text)
     return embedding["embedding"]
+
+
+def get_embeddings_batch(texts):
+    """Generates vector embeddings for a list of texts in a single request"""
+    embed_model = "models/embedding-001"
+    embedding = _get_genai().embed_content(model=embed_model, content=texts)
+    return np.asarray(embedding["embedding"], dtype=np.float32)
@@ -1,14 +1,42 @@
+import asyncio
 from pathlib import Path
+from typing import List, Tuple
+import pypdfium2 as pdfium
 from pdfminer.high_level import extract_text
 from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
 import re
+import threading
 from .vectorstore import add_or_create_faiss_index
 from io import BytesIO # Import for handling file bytes
 
+# PDFium is not thread-safe, even across different documents, and bulk_index
+# extracts files on several threads at once
+_PDFIUM_LOCK = threading.Lock()
+
 # --- Helper functions ---
 
+def pdfium_text(source):
+    """Extracts text from a PDF path or bytes with PDFium."""
+    with _PDFIUM_LOCK:
+        doc = pdfium.PdfDocument(source)
+        try:
+            pages = []
+            for page in doc:
+                textpage = page.get_textpage()
+                pages.append(textpage.get_text_range())
+                textpage.close()
+                page.close()
+            return "\n".join(pages)
+        finally:
+            doc.close()
+
 def read_pdf_bytes(file_bytes):
     """Reads PDF content from bytes/stream instead of a file path."""
+    try:
+        return pdfium_text(file_bytes)
+    except Exception as e:
+        print("PDFium read error, falling back to pdfminer:", e)
     try:
         # Use BytesIO to pass the bytes to extract_text
         txt = extract_text(BytesIO(file_bytes))
@@ -17,26 +45,39 @@ def read_pdf_bytes(file_bytes):
         print("PDF read error:", e)
         return ""
 
+def html_to_text(raw):
+    """Extracts visible text from HTML, falling back to BeautifulSoup on parse errors."""
+    try:
+        tree = LexborHTMLParser(raw)
+        root = tree.body or tree.root
+        return root.text(separator=" ") if root else ""
+    except Exception as e:
+        print("HTML parse error, falling back to BeautifulSoup:", e)
+        return BeautifulSoup(raw, "html.parser").get_text()
+
 def clean_text(t):
     t = re.sub(r"\s+", " ", t).strip()
     return t
 
 
 def chunk_text(text, chunk_size=800, overlap=100):
-    tokens = text.split()
+    # Slice the original string by word spans instead of re-joining a token list
+    spans = [(m.start(), m.end()) for m in re.finditer(r"\S+", text)]
     chunks = []
     i = 0
-    while i < len(tokens):
-        chunk = tokens[i : i + chunk_size]
-        chunks.append(" ".join(chunk))
+    while i < len(spans):
+        last = min(i + chunk_size, len(spans)) - 1
+        chunks.append(text[spans[i][0] : spans[last][1]])
         i += chunk_size - overlap
     return chunks
 # ------------------------
 
 
-def process_and_index_content(filename: str, file_bytes: bytes):
+def extract_chunks(filename: str, file_bytes: bytes):
     """
-    Processes the raw bytes of an uploaded file and adds it to the FAISS index.
+    Extracts and chunks the text of a file's raw bytes without indexing it.
+    Returns (filename, docs) where docs is a list of (doc_id, chunk) pairs;
+    docs is empty for unsupported or unreadable files.
     """
     text = ""
     file_extension = Path(filename).suffix.lower()
@@ -46,17 +87,18 @@ def process_and_index_content(filename: str, file_bytes: bytes):
     elif file_extension == ".pdf":
         text = read_pdf_bytes(file_bytes)
     elif file_extension in [".html", ".htm"]:
-        # Decode first, then pass to BeautifulSoup
+        # Decode first, then pass to the HTML parser
         raw = file_bytes.decode("utf-8", errors="ignore")
-        soup = BeautifulSoup(raw, "html.parser")
-        text = soup.get_text()
+        text = html_to_text(raw)
     else:
         # Unsupported file type for RAG processing
-        return False, f"Unsupported file type: {file_extension}"
+        print(f"Skipping {filename}: unsupported file type {file_extension}")
+        return filename, []
 
     text = clean_text(text)
     if not text:
-        return False, "File processed but contained no readable text."
+        print(f"Skipping {filename}: no readable text.")
+        return filename, []
 
     chunks = chunk_text(text)
     docs = []
@@ -65,9 +107,26 @@ def process_and_index_content(filename: str, file_bytes: bytes):
         # The document ID format is crucial for tracing the source
         docs.append((f"{filename}_chunk_{idx}", ch))
     
-    add_or_create_faiss_index(docs)
-    
-    return True, f"Successfully indexed {len(chunks)} chunks from {filename}."
+    return filename, docs
+
+
+async def bulk_index(files: List[Tuple[str, bytes]]):
+    """
+    Extracts several files concurrently on worker threads, then embeds and
+    indexes the chunks of all of them in a single batch.
+    Returns (number of new chunks indexed, filenames that yielded no text).
+    """
+    results = await asyncio.gather(
+        *[asyncio.to_thread(extract_chunks, name, data) for name, data in files]
+    )
+    all_docs = [doc for _, docs in results for doc in docs]
+    skipped = [name for name, docs in results if not docs]
+
+    indexed = 0
+    if all_docs:
+        indexed = await asyncio.to_thread(add_or_create_faiss_index, all_docs)
+
+    return indexed, skipped
 
 
 def ingest_folder(folder="backend/sample_docs"):
@@ -75,40 +134,11 @@ def ingest_folder(folder="backend/sample_docs"):
     Helper function for initial/manual indexing of the sample_docs folder.
     """
     print(f"--- Running initial ingestion from {folder} ---")
-    all_chunks = []
-    
-    # Need to read content as bytes for consistency, but for this old function 
-    # reading text from file path is simpler.
-    def read_text_file(path):
-        return Path(path).read_text(encoding="utf-8", errors="ignore")
-    def read_pdf_path(path):
-        try:
-            return extract_text(path)
-        except Exception:
-            return ""
-
-    for p in Path(folder).iterdir():
-        if p.is_file():
-            text = ""
-            if p.suffix.lower() in [".txt", ".md"]:
-                text = read_text_file(p)
-            elif p.suffix.lower() == ".pdf":
-                text = read_pdf_path(p)
-            elif p.suffix.lower() in [".html", ".htm"]:
-                raw = read_text_file(p)
-                soup = BeautifulSoup(raw, "html.parser")
-                text = soup.get_text()
-            
-            text = clean_text(text)
-            if not text: continue
-
-            chunks = chunk_text(text)
-            for idx, ch in enumerate(chunks):
-                all_chunks.append((f"{p.name}_chunk_{idx}", ch))
-
-    if all_chunks:
-        add_or_create_faiss_index(all_chunks)
-        print("--- Initial ingestion complete. ---")
+    files = [(p.name, p.read_bytes()) for p in Path(folder).iterdir() if p.is_file()]
+
+    indexed, skipped = asyncio.run(bulk_index(files))
+    if len(skipped) < len(files):
+        print(f"--- Initial ingestion complete ({indexed} new chunks). ---")
     else:
         print("No documents found or processed in the sample_docs folder.")
 
@@ -12,6 +12,7 @@ def rag_query(user_query, retrieved_context):
     return generate_answer(prompt)
 
 
-# Example embedding usage
-text = "Artificial Intelligence improves productivity."
-print(get_embedding(text))
+if __name__ == "__main__":
+    # Example embedding usage
+    text = "Artificial Intelligence improves productivity."
+    print(get_embedding(text))
@@ -1,6 +1,16 @@
+import asyncio
+import json
+import threading
+from collections import OrderedDict
+
+import faiss
+import numpy as np
 import torch
+from typing import List
+
 from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import os
 from dotenv import load_dotenv
@@ -12,9 +22,9 @@ from slowapi.errors import RateLimitExceeded
 
 # --- Crucial Relative Imports ---
 
-from .vectorstore import search
-from .ingest import process_and_index_content
-from .gemini_utils import generate_answer
+from .vectorstore import search, load_index, embed_query
+from .ingest import bulk_index
+from .gemini_utils import generate_answer, generate_answer_stream
 
 # --- Load Config ---
 
@@ -51,55 +61,204 @@ if not USE_GEMINI:
     try:
         from transformers import pipeline
 
+        # CPU matmuls dominate GPT-2 inference; use every core
+        torch.set_num_threads(os.cpu_count() or 1)
+
         print("Loading local fallback model gpt2...")
         local_generator = pipeline(
             "text-generation",
             model="gpt2",
             trust_remote_code=True,
-            torch_dtype=torch.float32,
+            torch_dtype=torch.bfloat16,
             device="cpu",
         )
+        local_generator.model.eval()
         print("Local model loaded successfully.")
     except ImportError:
         local_generator = None
         print("Could not load local model; transformers package not found.")
 
 
+def llm_available():
+    return bool((USE_GEMINI and GEMINI_API_KEY) or local_generator)
+
+
+def generate(prompt: str) -> str:
+    """Blocking answer generation with whichever LLM backend is configured."""
+    if USE_GEMINI and GEMINI_API_KEY:
+        return generate_answer(prompt)
+    with torch.inference_mode():
+        outputs = local_generator(prompt, max_length=200)
+    return outputs[0]["generated_text"]
+
+
+# --- Warm Vector Store Cache ---
+
+@app.on_event("startup")
+def warm_index_cache():
+    try:
+        load_index()
+        print("FAISS index loaded into memory.")
+    except FileNotFoundError:
+        print("No FAISS index found yet; it will be created on first ingest.")
+
+
+# --- Semantic Answer Cache ---
+
+class SemanticCache:
+    """
+    Caches answers by query embedding so near-duplicate questions skip
+    retrieval and generation. Answers depend on the retrieval settings too,
+    so each settings key (e.g. (top_k, use_reranking)) gets its own index.
+    Entries are evicted least-recently-used across all keys.
+    """
+
+    def __init__(self, threshold=0.95, max_entries=10_000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._indexes = {}  # settings key -> faiss index of query vectors
+        self._entries = OrderedDict()  # cache id -> (settings key, answer, sources)
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, key, q_vec: np.ndarray):
+        """Return the cached (answer, sources) for the closest past query with the same key, or None."""
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None or index.ntotal == 0:
+                return None
+            D, I = index.search(q_vec, 1)
+            entry_id = int(I[0][0])
+            if entry_id < 0 or D[0][0] < self.threshold:
+                return None
+            self._entries.move_to_end(entry_id)
+            _, answer, sources = self._entries[entry_id]
+            return answer, sources
+
+    def insert(self, key, q_vec: np.ndarray, answer: str, sources: list):
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = faiss.IndexIDMap2(faiss.IndexFlatIP(q_vec.shape[1]))
+                self._indexes[key] = index
+            entry_id = self._next_id
+            self._next_id += 1
+            index.add_with_ids(q_vec, np.asarray([entry_id], dtype=np.int64))
+            self._entries[entry_id] = (key, answer, sources)
+            if len(self._entries) > self.max_entries:
+                evicted_id, (evicted_key, _, _) = self._entries.popitem(last=False)
+                evicted_index = self._indexes[evicted_key]
+                evicted_index.remove_ids(np.asarray([evicted_id], dtype=np.int64))
+                if evicted_index.ntotal == 0:
+                    del self._indexes[evicted_key]
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+            self._entries.clear()
+
+
+semantic_cache = SemanticCache()
+
+
 # --- Request Models ---
 
 class QueryRequest(BaseModel):
     question: str
     top_k: int = 4
     use_reranking: bool = True
+    # Stream the answer as server-sent events instead of a single JSON body
+    stream: bool = False
+
+
+# --- Streaming Helpers ---
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_answer(prompt: str, cache_key, q_vec: np.ndarray, sources: list):
+    """
+    Yields SSE events: the sources, then answer text as it is generated,
+    then "done". Starlette iterates sync generators on its threadpool, so
+    the blocking LLM calls here don't stall the event loop.
+    """
+    yield sse_event("sources", sources)
+    parts = []
+    if USE_GEMINI and GEMINI_API_KEY:
+        for text in generate_answer_stream(prompt):
+            parts.append(text)
+            yield sse_event("token", text)
+    else:
+        parts.append(generate(prompt))
+        yield sse_event("token", parts[-1])
+    semantic_cache.insert(cache_key, q_vec, "".join(parts), sources)
+    yield sse_event("done", {})
+
+
+def stream_cached(answer: str, sources: list):
+    yield sse_event("sources", sources)
+    yield sse_event("token", answer)
+    yield sse_event("done", {})
 
 
 @app.post("/query")
 @limiter.limit("10/minute")
 async def query(req: QueryRequest, request: Request):
+    if not llm_available():
+        raise HTTPException(status_code=503, detail="No LLM backend available")
+
     try:
-        retrieved_chunks = search(req.question, top_k=req.top_k, use_reranking=req.use_reranking)
+        # Blocking work runs on worker threads so concurrent queries overlap.
+        # Embeddings are normalized, so the cache's inner product is cosine similarity
+        q_vec = await asyncio.to_thread(embed_query, req.question)
+        cache_key = (req.top_k, req.use_reranking)
+        cached = semantic_cache.lookup(cache_key, q_vec)
+        if cached:
+            answer, sources = cached
+            if req.stream:
+                return StreamingResponse(
+                    stream_cached(answer, sources), media_type="text/event-stream"
+                )
+            return {"answer": answer, "sources": sources}
+
+        retrieved_chunks = await asyncio.to_thread(
+            search,
+            req.question,
+            top_k=req.top_k,
+            use_reranking=req.use_reranking,
+            query_vec=q_vec,
+        )
         context = "\n\n---\n\n".join(retrieved_chunks)
         prompt = f"Context: {context}\n\nQuestion: {req.question}\n\nAnswer in a clear and concise way."
 
-        if USE_GEMINI and GEMINI_API_KEY:
-            answer = generate_answer(prompt)
-        elif local_generator:
-            outputs = local_generator(prompt, max_length=200)
-            answer = outputs[0]["generated_text"]
-        else:
-            raise HTTPException(status_code=503, detail="No LLM backend available")
+        if req.stream:
+            return StreamingResponse(
+                stream_answer(prompt, cache_key, q_vec, retrieved_chunks),
+                media_type="text/event-stream",
+            )
 
-        return {"answer": answer}
+        answer = await asyncio.to_thread(generate, prompt)
+
+        semantic_cache.insert(cache_key, q_vec, answer, retrieved_chunks)
+        return {"answer": answer, "sources": retrieved_chunks}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/ingest")
 @limiter.limit("5/hour")
-async def ingest_document(file: UploadFile = File(...), request: Request = None):
+async def ingest_document(files: List[UploadFile] = File(...), request: Request = None):
     try:
-        contents = await file.read()
-        await process_and_index_content(contents.decode("utf-8"))
-        return {"detail": "Document ingested successfully"}
+        uploads = [(file.filename, await file.read()) for file in files]
+        indexed, skipped = await bulk_index(uploads)
+        if indexed:
+            # Cached answers may be stale once new documents are indexed
+            semantic_cache.clear()
+
+        message = f"Indexed {indexed} new chunks from {len(uploads) - len(skipped)} file(s)."
+        if skipped:
+            message += f" Skipped (unsupported or no readable text): {', '.join(skipped)}."
+        return {"message": message, "chunks": indexed, "skipped": skipped}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,10 +1,18 @@
 import os
-import pickle
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from hashlib import blake2b
 import numpy as np
-from typing import List, Tuple
+from functools import lru_cache
+from typing import List, Optional, Tuple
 from pathlib import Path
 from dotenv import load_dotenv
-from .gemini_utils import get_embedding
+from .gemini_utils import get_embeddings_batch
 
 # --- Configuration ---
 
@@ -17,9 +25,14 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 try:
     # Ensure this package is installed via requirements.txt
+    import torch
     from sentence_transformers import SentenceTransformer, CrossEncoder
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    reranker = CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2')
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = SentenceTransformer("all-MiniLM-L6-v2", device=device)
+    if device == "cuda":
+        # fp16 halves memory traffic on GPU tensor cores
+        model.half()
+    reranker = CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2', device=device)
 except ImportError:
     model = None
     reranker = None
@@ -31,68 +44,645 @@ import faiss
 # Use the paths defined by your project structure
 
 VSTORE_PATH = os.getenv("VECTOR_STORE_PATH", "backend/faiss.index")
-METADATA_PATH = "backend/metadata.pkl"
+METADATA_PATH = "backend/meta.sqlite"
+
+# "hnsw" for graph search over full float32 vectors, "hnsw_sq" for graph
+# search over 8-bit scalar-quantized vectors, "flat" for exact search on tiny
+# corpora. On a 20k x 384 normalized test set hnsw_sq files were ~2.7x smaller
+# (HNSW links are not quantized) and recall@12 fell from 1.00 to ~0.97.
+INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "hnsw").lower()
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+# The quantizer learns per-dimension ranges from stored vectors, so hnsw_sq
+# stores start full-precision and are rebuilt quantized, once, when they
+# reach this many chunks
+SQ_MIN_TRAIN = 1000
+# Widen the learned ranges by this fraction so later batches are rarely clipped
+SQ_RANGE_MARGIN = 0.1
+
+# --- In-Memory Index Cache ---
+
+# The index is kept in process memory and only re-read from disk when the
+# index file is newer than the cached copy. The cached object is never
+# mutated: ingest adds to a clone and swaps it in, so searches running
+# against the previous object are unaffected.
+# "generation" counts swaps; "written" is the newest generation on disk.
+_INDEX_CACHE = {"index": None, "mtime": 0.0, "generation": 0, "written": 0}
+# Held while a new index version is built or written to disk
+_WRITE_LOCK = threading.Lock()
+# Held briefly around every read-modify-write of _INDEX_CACHE
+_CACHE_LOCK = threading.Lock()
+
+# --- Chunk Store ---
+
+# Chunk text lives in sqlite and is fetched by FAISS id at query time
+_DB = None
+_DB_LOCK = threading.Lock()
+
+# Gemini accepts at most 100 texts per embed_content request
+GEMINI_BATCH_SIZE = 100
+ENCODE_BATCH_SIZE = 128
+RERANK_BATCH_SIZE = 32
+
+# Cross-encoder scores keyed by (query hash, chunk hash)
+RERANK_CACHE_SIZE = 50_000
+RERANK_CACHE_TTL = 15 * 60  # seconds
+_RERANK_CACHE = OrderedDict()  # (qhash, chash) -> (score, timestamp)
+_RERANK_LOCK = threading.Lock()
+
+QUOTED_SPAN_RE = re.compile(r'"([^"]+)"')
+
+# Candidates pulled from full-text search for keyword-style queries
+FTS_CANDIDATES = 50
+
+# Concurrent FAISS searches and reranker calls arriving within this window
+# are run as one batched call
+BATCH_WINDOW = 0.005  # seconds
+MAX_BATCH = 32
 
 
 def embed_texts(texts: List[str]) -> np.ndarray:
     """
-    Return embeddings for a list of texts. Uses Gemini if USE_GEMINI True and set up,
+    Return L2-normalized float32 embeddings for a list of texts, so inner product
+    equals cosine similarity. Uses Gemini if USE_GEMINI True and set up,
     otherwise uses local sentence-transformers model.
     """
     if USE_GEMINI and GEMINI_API_KEY:
-        embeddings = [get_embedding(text) for text in texts]
-        return np.array(embeddings)
+        batches = [
+            get_embeddings_batch(texts[i : i + GEMINI_BATCH_SIZE])
+            for i in range(0, len(texts), GEMINI_BATCH_SIZE)
+        ]
+        vecs = np.ascontiguousarray(np.concatenate(batches), dtype=np.float32)
+        faiss.normalize_L2(vecs)
+        return vecs
     elif model:
-        return model.encode(texts)
+        vecs = model.encode(
+            texts,
+            batch_size=ENCODE_BATCH_SIZE,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+        return vecs.astype("float32", copy=False)
     else:
         raise ValueError("No embedding model available")
 
 
-def load_index() -> Tuple[faiss.Index, dict]:
+@lru_cache(maxsize=1024)
+def _embed_query_remote(query: str) -> np.ndarray:
+    return embed_texts([query])
+
+
+def embed_query(query: str) -> np.ndarray:
+    """
+    Return the normalized (1, dim) embedding for a query. Gemini embeddings
+    are cached per query string to skip repeat network round trips.
+    """
+    if USE_GEMINI and GEMINI_API_KEY:
+        return _embed_query_remote(query)
+    return embed_texts([query])
+
+
+def _text_hash(text: str) -> str:
+    return blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def rerank_scores(query: str, candidates: List[str]) -> np.ndarray:
+    """
+    Cross-encoder relevance scores for (query, candidate) pairs. Scores seen
+    within RERANK_CACHE_TTL are reused; only uncached pairs hit the model.
+    """
+    qhash = _text_hash(query)
+    keys = [(qhash, _text_hash(chunk)) for chunk in candidates]
+    scores = np.empty(len(candidates), dtype=np.float32)
+    now = time.monotonic()
+
+    missing = []
+    with _RERANK_LOCK:
+        for i, key in enumerate(keys):
+            hit = _RERANK_CACHE.get(key)
+            if hit and now - hit[1] < RERANK_CACHE_TTL:
+                _RERANK_CACHE.move_to_end(key)
+                scores[i] = hit[0]
+            else:
+                missing.append(i)
+
+    if missing:
+        pairs = [[query, candidates[i]] for i in missing]
+        new_scores = _rerank_batcher.submit(None, pairs)
+        scores[missing] = new_scores
+        with _RERANK_LOCK:
+            for i, score in zip(missing, new_scores):
+                _RERANK_CACHE[keys[i]] = (float(score), now)
+                _RERANK_CACHE.move_to_end(keys[i])
+            while len(_RERANK_CACHE) > RERANK_CACHE_SIZE:
+                _RERANK_CACHE.popitem(last=False)
+
+    return scores
+
+
+def literal_matches(query: str, candidates: List[str]) -> List[str]:
+    """
+    Candidates containing every quoted span of the query, or the whole query
+    when nothing is quoted (case-insensitive, whole words only, so "API"
+    does not match "capital"). A blank query matches nothing.
+    """
+    needles = [span.strip() for span in QUOTED_SPAN_RE.findall(query)]
+    needles = [n for n in needles if n] or [query.strip()]
+    if not needles[0]:
+        return []
+    # Lookarounds rather than \b so needles may start or end with punctuation
+    patterns = [
+        re.compile(r"(?<!\w)" + re.escape(n) + r"(?!\w)", re.IGNORECASE) for n in needles
+    ]
+    return [c for c in candidates if all(p.search(c) for p in patterns)]
+
+
+def create_index(dim: int, n_train: int) -> faiss.Index:
+    """
+    Build an empty inner-product index of the configured type, wrapped in an
+    IndexIDMap so every vector carries its explicit chunk id. n_train is the
+    number of vectors a quantized index will be trained on; below
+    SQ_MIN_TRAIN, hnsw_sq builds a full-precision index until
+    _quantize_when_ready() converts it.
+    """
+    if INDEX_TYPE == "flat":
+        base = faiss.IndexFlatIP(dim)
+    elif INDEX_TYPE == "hnsw_sq" and n_train >= SQ_MIN_TRAIN:
+        base = faiss.IndexHNSWSQ(
+            dim, faiss.ScalarQuantizer.QT_8bit, HNSW_M, faiss.METRIC_INNER_PRODUCT
+        )
+        base.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        sq = faiss.downcast_index(base.storage).sq
+        sq.rangestat = faiss.ScalarQuantizer.RS_minmax
+        sq.rangestat_arg = SQ_RANGE_MARGIN
+    else:
+        base = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        base.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    return faiss.IndexIDMap(base)
+
+
+def _quantize_when_ready(index: faiss.Index) -> faiss.Index:
+    """
+    With FAISS_INDEX_TYPE=hnsw_sq, rebuild a full-precision HNSW index as a
+    quantized one trained on all of its vectors once it holds SQ_MIN_TRAIN
+    of them. Returns index unchanged otherwise.
+    """
+    if INDEX_TYPE != "hnsw_sq" or index.ntotal < SQ_MIN_TRAIN:
+        return index
+    base = faiss.downcast_index(index.index)
+    if not isinstance(base, faiss.IndexHNSWFlat):
+        return index
+
+    vecs = base.reconstruct_n(0, base.ntotal)
+    ids = faiss.vector_to_array(index.id_map)
+    quantized = create_index(index.d, len(vecs))
+    quantized.train(vecs)
+    quantized.add_with_ids(vecs, ids)
+    print(f"Rebuilt the FAISS index with 8-bit quantization over {len(vecs)} chunks.")
+    return quantized
+
+
+def _set_ef_search(index: faiss.Index, k: int):
+    """Widen the HNSW search beam for k results; no-op for other index types."""
+    if isinstance(index, faiss.IndexIDMap):
+        index = faiss.downcast_index(index.index)
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = max(64, k * 8)
+
+
+def get_db() -> sqlite3.Connection:
+    """
+    Return the shared connection to the chunk store, creating the schema on
+    first use. Row ids are the FAISS ids of the chunk vectors.
+    """
+    global _DB
+    with _DB_LOCK:
+        if _DB is None:
+            _DB = sqlite3.connect(METADATA_PATH, check_same_thread=False)
+            # hash identifies chunk text, so re-uploaded chunks map to their existing id
+            _DB.execute(
+                "CREATE TABLE IF NOT EXISTS docs("
+                "id INTEGER PRIMARY KEY, doc_id TEXT, chunk TEXT, hash TEXT UNIQUE)"
+            )
+            # BM25 keyword index over the same chunks; rowid matches docs.id
+            _DB.execute("CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(text)")
+            _DB.commit()
+    return _DB
+
+
+def get_chunks(ids) -> List[str]:
+    """
+    Fetch chunk texts for FAISS ids, preserving their order. Negative ids
+    (FAISS padding for missing results) and unknown ids are dropped.
+    """
+    ids = [int(i) for i in ids if i >= 0]
+    if not ids:
+        return []
+    placeholders = ",".join("?" * len(ids))
+    db = get_db()
+    with _DB_LOCK:
+        rows = db.execute(
+            f"SELECT id, chunk FROM docs WHERE id IN ({placeholders})", ids
+        ).fetchall()
+    chunks = dict(rows)
+    return [chunks[i] for i in ids if i in chunks]
+
+
+def chunk_hash(chunk: str) -> str:
+    return blake2b(chunk.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _stored_ids(hashes: List[str]) -> dict:
+    """
+    Map each chunk hash already present in the chunk store to its row id.
+    """
+    db = get_db()
+    stored = {}
+    # Stay well under sqlite's bound-parameter limit
+    for i in range(0, len(hashes), 500):
+        batch = hashes[i : i + 500]
+        placeholders = ",".join("?" * len(batch))
+        with _DB_LOCK:
+            rows = db.execute(
+                f"SELECT hash, id FROM docs WHERE hash IN ({placeholders})", batch
+            ).fetchall()
+        stored.update(rows)
+    return stored
+
+
+def _pending_docs(new_docs: List[Tuple[str, str, str]], index: Optional[faiss.Index]):
+    """
+    Drop (doc_id, chunk, hash) entries whose chunk is stored *and* has a
+    vector in index. Returns (entries still to index, row ids of stored
+    chunks without a vector) - such rows are left behind when the process
+    dies before the index is persisted, and must be replaced, not trusted.
+    """
+    stored = _stored_ids([h for _, _, h in new_docs])
+    indexed = set()
+    if stored and isinstance(index, faiss.IndexIDMap) and index.ntotal:
+        ids = np.fromiter(stored.values(), dtype=np.int64)
+        indexed = set(ids[np.isin(ids, faiss.vector_to_array(index.id_map))].tolist())
+    pending = [d for d in new_docs if stored.get(d[2]) not in indexed]
+    orphans = [stored[h] for _, _, h in pending if h in stored]
+    return pending, orphans
+
+
+def keyword_terms(query: str) -> List[str]:
+    """
+    Quoted phrases and capitalized tokens (past the first word) of a query.
+    An empty list means the query doesn't look like a keyword lookup.
+    """
+    terms = [span.strip() for span in QUOTED_SPAN_RE.findall(query)]
+    words = QUOTED_SPAN_RE.sub(" ", query).split()
+    for word in words[1:]:
+        word = word.strip("?!.,;:()'")
+        if len(word) > 1 and word[0].isupper():
+            terms.append(word)
+    return [t for t in terms if t]
+
+
+def keyword_candidates(terms: List[str], limit=FTS_CANDIDATES) -> List[str]:
+    """
+    Chunks matching any of the terms, best BM25 match first.
+    """
+    # Quote every term so FTS5 treats it as a phrase, not query syntax
+    match = " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+    db = get_db()
+    with _DB_LOCK:
+        rows = db.execute(
+            "SELECT text FROM chunks_fts WHERE chunks_fts MATCH ? ORDER BY rank LIMIT ?",
+            (match, limit),
+        ).fetchall()
+    return [text for (text,) in rows]
+
+
+def _index_mtime() -> float:
+    path = Path(VSTORE_PATH)
+    return path.stat().st_mtime if path.exists() else 0.0
+
+
+def _cache_is_fresh() -> bool:
+    return _INDEX_CACHE["index"] is not None and _index_mtime() <= _INDEX_CACHE["mtime"]
+
+
+def load_index() -> faiss.Index:
+    """
+    Load the FAISS index, reusing the in-memory copy unless the index file
+    on disk has changed since it was cached. While this process is writing
+    the index, the cached copy is always used.
     """
-    Load FAISS index and metadata.
+    if _INDEX_CACHE["index"] is not None and (_WRITE_LOCK.locked() or _cache_is_fresh()):
+        return _INDEX_CACHE["index"]
+    return _read_index()
+
+
+def _read_index() -> faiss.Index:
+    """
+    Read the index file from disk and cache it, unless the cache changed
+    while reading (e.g. an ingest swapped in a newer copy), in which case
+    the cached index wins and is returned instead.
     """
     if not Path(VSTORE_PATH).exists():
         raise FileNotFoundError(f"FAISS index not found at {VSTORE_PATH}")
-    if not Path(METADATA_PATH).exists():
-        raise FileNotFoundError(f"Metadata not found at {METADATA_PATH}")
 
+    with _CACHE_LOCK:
+        generation = _INDEX_CACHE["generation"]
+    mtime = _index_mtime()
     index = faiss.read_index(VSTORE_PATH)
-    with open(METADATA_PATH, "rb") as f:
-        meta = pickle.load(f)
-    return index, meta
+
+    with _CACHE_LOCK:
+        if _INDEX_CACHE["index"] is not None and (
+            _INDEX_CACHE["generation"] != generation or mtime <= _INDEX_CACHE["mtime"]
+        ):
+            return _INDEX_CACHE["index"]
+        # The copy just read is already on disk, so there is nothing to persist
+        _INDEX_CACHE["generation"] += 1
+        _INDEX_CACHE.update(index=index, mtime=mtime, written=_INDEX_CACHE["generation"])
+    return index
 
 
-def search(query: str, top_k=4, use_reranking=True) -> List[str]:
+def _swap_index(index: faiss.Index):
+    """
+    Make index the cached copy that searches and the next write will use.
+    """
+    with _CACHE_LOCK:
+        _INDEX_CACHE["generation"] += 1
+        _INDEX_CACHE["index"] = index
+
+
+def _persist_index():
+    """
+    Write the newest cached index to disk. Runs on a background thread. Each
+    ingest starts one of these, and they may run in any order, so each
+    writes whatever is current and skips work an earlier-finishing writer
+    already did, instead of writing the snapshot its ingest produced. The
+    index is written to a temp path and renamed over the old file, so
+    readers never see a partially written file.
+    """
+    with _WRITE_LOCK:
+        with _CACHE_LOCK:
+            index = _INDEX_CACHE["index"]
+            generation = _INDEX_CACHE["generation"]
+            if index is None or generation <= _INDEX_CACHE["written"]:
+                return
+
+        faiss.write_index(index, VSTORE_PATH + ".tmp")
+        os.replace(VSTORE_PATH + ".tmp", VSTORE_PATH)
+
+        with _CACHE_LOCK:
+            # Later generations are clones of this one, so the cache still
+            # contains everything now on disk
+            _INDEX_CACHE["written"] = generation
+            _INDEX_CACHE["mtime"] = _index_mtime()
+
+
+def add_or_create_faiss_index(docs: List[Tuple[str, str]]) -> int:
+    """
+    Embed (doc_id, chunk) pairs, append the vectors to the FAISS index and
+    the chunks to the chunk store, creating the index on first use.
+    Chunks whose text is already stored with a vector in the index are
+    skipped without being embedded.
+    Returns the number of chunks newly indexed.
+    """
+    new_docs = []
+    seen = set()
+    for doc_id, chunk in docs:
+        h = chunk_hash(chunk)
+        if h not in seen:
+            seen.add(h)
+            new_docs.append((doc_id, chunk, h))
+    try:
+        current = load_index()
+    except FileNotFoundError:
+        current = None
+    new_docs, _ = _pending_docs(new_docs, current)
+    if not new_docs:
+        return 0
+
+    vecs = embed_texts([chunk for _, chunk, _ in new_docs])
+
+    with _WRITE_LOCK:
+        try:
+            # load_index() trusts the cache while _WRITE_LOCK is held, so check
+            # for a newer file (e.g. from `python -m backend.ingest`) here, or
+            # persisting would overwrite the vectors it added
+            current = _INDEX_CACHE["index"] if _cache_is_fresh() else _read_index()
+        except FileNotFoundError:
+            current = None
+
+        # Another ingest may have indexed some of these chunks while we embedded
+        pending, orphans = _pending_docs(new_docs, current)
+        if len(pending) < len(new_docs):
+            pending_hashes = {h for _, _, h in pending}
+            keep = [i for i, d in enumerate(new_docs) if d[2] in pending_hashes]
+            new_docs = pending
+            vecs = vecs[keep]
+            if not new_docs:
+                return 0
+
+        if current is None:
+            index = create_index(vecs.shape[1], len(vecs))
+        else:
+            # Copy-on-write: FAISS can't search and add on one index concurrently
+            index = faiss.clone_index(current)
+
+        if not isinstance(index, faiss.IndexIDMap):
+            raise ValueError(
+                f"{VSTORE_PATH} predates explicit chunk ids; delete it and "
+                f"{METADATA_PATH} and re-run ingestion"
+            )
+        if vecs.shape[1] != index.d:
+            raise ValueError(
+                f"Embedding dimension {vecs.shape[1]} does not match the index "
+                f"dimension {index.d}; was USE_GEMINI changed? Delete {VSTORE_PATH} "
+                f"and {METADATA_PATH} and re-run ingestion"
+            )
+
+        if not index.is_trained:
+            index.train(vecs)
+
+        db = get_db()
+        with _DB_LOCK:
+            (start,) = db.execute("SELECT COALESCE(MAX(id), -1) + 1 FROM docs").fetchone()
+        if index.ntotal:
+            start = max(start, int(faiss.vector_to_array(index.id_map).max()) + 1)
+        new_ids = np.arange(start, start + len(new_docs), dtype=np.int64)
+
+        # Vectors first, on the private copy: if this fails nothing is stored
+        index.add_with_ids(vecs, new_ids)
+        index = _quantize_when_ready(index)
+
+        with _DB_LOCK:
+            try:
+                # Replace rows left without a vector by an earlier failed ingest
+                for i in range(0, len(orphans), 500):
+                    batch = orphans[i : i + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    db.execute(f"DELETE FROM docs WHERE id IN ({placeholders})", batch)
+                    db.execute(
+                        f"DELETE FROM chunks_fts WHERE rowid IN ({placeholders})", batch
+                    )
+                db.executemany(
+                    "INSERT INTO docs VALUES (?,?,?,?)",
+                    [(int(i), *doc) for i, doc in zip(new_ids, new_docs)],
+                )
+                db.executemany(
+                    "INSERT INTO chunks_fts(rowid, text) VALUES (?,?)",
+                    [(int(i), chunk) for i, (_, chunk, _) in zip(new_ids, new_docs)],
+                )
+                db.commit()
+            except Exception:
+                # The updated copy is discarded, so the index stays as it was
+                db.rollback()
+                raise
+
+        # Swap in the updated copy so searches see new chunks immediately
+        _swap_index(index)
+
+    # Non-daemon so a pending write still completes if the process is exiting
+    threading.Thread(target=_persist_index).start()
+    return len(new_docs)
+
+
+# --- Micro-Batching ---
+
+class _MicroBatcher:
+    """
+    Coalesces calls made from concurrent threads (e.g. /query requests on
+    the server's threadpool) into one batched call. batch_fn(key, items)
+    receives the items of all queued callers sharing a key and returns one
+    result per item.
+    """
+
+    def __init__(self, batch_fn, window=BATCH_WINDOW, max_batch=MAX_BATCH):
+        self._batch_fn = batch_fn
+        self._window = window
+        self._max_batch = max_batch
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, key, item):
+        """Queue item and block until the batch containing it has run."""
+        future = Future()
+        self._queue.put((key, item, future))
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+        return future.result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._window
+            while len(batch) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            groups = {}
+            for key, item, future in batch:
+                groups.setdefault(key, []).append((item, future))
+            for key, entries in groups.items():
+                try:
+                    results = self._batch_fn(key, [item for item, _ in entries])
+                except Exception as e:
+                    for _, future in entries:
+                        future.set_exception(e)
+                    continue
+                for (_, future), result in zip(entries, results):
+                    future.set_result(result)
+
+
+def _search_batch(k: int, q_vecs: List[np.ndarray]) -> List[np.ndarray]:
+    """FAISS ids of the top k hits for each (1, dim) query vector, in one search."""
+    # Running on the batcher's single worker keeps searches from racing each
+    # other over efSearch; racing ingest is prevented by copy-on-write in
+    # add_or_create_faiss_index, which never mutates the object returned here
+    index = load_index()
+    _set_ef_search(index, k)
+    D, I = index.search(np.concatenate(q_vecs), k)
+    return list(I)
+
+
+def _rerank_batch(_, pair_lists: List[List[List[str]]]) -> List[np.ndarray]:
+    """Cross-encoder scores for each caller's pairs, in one forward pass."""
+    pairs = [pair for pair_list in pair_lists for pair in pair_list]
+    scores = reranker.predict(
+        pairs,
+        batch_size=RERANK_BATCH_SIZE,
+        convert_to_numpy=True,
+        show_progress_bar=False,
+    )
+    bounds = np.cumsum([0] + [len(pair_list) for pair_list in pair_lists])
+    return [scores[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+_search_batcher = _MicroBatcher(_search_batch)
+_rerank_batcher = _MicroBatcher(_rerank_batch)
+
+
+def search(
+    query: str,
+    top_k=4,
+    use_reranking=True,
+    query_vec: Optional[np.ndarray] = None,
+) -> List[str]:
     """
     Search with optional re-ranking to refine context quality.
     Args:
         query: User query string
         top_k: Number of results to return after re-ranking
         use_reranking: Whether to apply re-ranking model
+        query_vec: Precomputed query embedding, to avoid embedding the query again
     """
-    index, meta = load_index()
-
-    # Step 1: Initial FAISS retrieval (get more candidates for re-ranking)
     initial_k = top_k * 3 if use_reranking else top_k
-    q_vec = embed_texts([query])
-    D, I = index.search(q_vec, initial_k)
-
-    # Step 2: Collect candidate chunks
-    candidates = []
-    for idx in I[0]:
-        if idx >= 0 and idx < len(meta["docs"]):
-            _, chunk = meta["docs"][idx]
-            candidates.append(chunk)
-
-    # Step 3: Apply re-ranking if enabled and model available
-    if use_reranking and reranker and len(candidates) > 0:
-        pairs = [[query, chunk] for chunk in candidates]
-        scores = reranker.predict(pairs)
-        ranked_indices = np.argsort(scores)[::-1][:top_k]
+
+    # Step 1: Keyword-style queries (quoted phrases, names) try full-text
+    # search first and skip FAISS entirely when it finds enough candidates
+    terms = keyword_terms(query)
+    candidates = keyword_candidates(terms) if terms else []
+
+    # Step 2: Otherwise FAISS retrieval (get more candidates for re-ranking),
+    # keeping any keyword hits ahead of the dense results
+    if len(candidates) < initial_k:
+        q_vec = query_vec if query_vec is not None else embed_query(query)
+        # The vector is stacked with other callers' in one FAISS search, so a
+        # malformed one must be rejected here rather than fail the whole batch
+        q_vec = np.asarray(q_vec, dtype=np.float32)
+        if q_vec.size == 0 or q_vec.ndim > 2 or (q_vec.ndim == 2 and q_vec.shape[0] != 1):
+            raise ValueError(f"query_vec must be a single vector, got shape {q_vec.shape}")
+        q_vec = q_vec.reshape(1, -1)
+        dim = load_index().d
+        if q_vec.shape[1] != dim:
+            raise ValueError(
+                f"query_vec has dimension {q_vec.shape[1]}, the index expects {dim}"
+            )
+        # Batched with concurrent searches for the same k
+        ids = _search_batcher.submit(initial_k, q_vec)
+        seen = set(candidates)
+        candidates += [c for c in get_chunks(ids) if c not in seen]
+
+    # Step 3: Apply re-ranking if enabled, model available and there is something to drop
+    if use_reranking and reranker and len(candidates) > top_k:
+        # Literal lookups (filenames, quoted phrases) don't need the cross-encoder
+        matches = literal_matches(query, candidates)
+        if len(matches) >= top_k:
+            return matches[:top_k]
+
+        scores = rerank_scores(query, candidates)
+        # Partial selection of the top_k, then sort only those
+        top_idx = np.argpartition(-scores, top_k)[:top_k]
+        ranked_indices = top_idx[np.argsort(-scores[top_idx])]
         results = [candidates[i] for i in ranked_indices]
         return results
 
-    # Otherwise return initial FAISS results truncated to top_k
+    # Otherwise return initial results truncated to top_k
     return candidates[:top_k]
 
@@ -81,15 +81,18 @@ def handle_upload():
     st.sidebar.markdown("## 📚 Add Documents")
     
     file_types = ["pdf", "txt", "md", "html"]
-    uploaded_file = st.sidebar.file_uploader(
-        "Upload a PDF, TXT, MD, or HTML file to index:", 
-        type=file_types
+    uploaded_files = st.sidebar.file_uploader(
+        "Upload PDF, TXT, MD, or HTML files to index:", 
+        type=file_types,
+        accept_multiple_files=True,
     )
 
-    if uploaded_file is not None:
-        if st.sidebar.button("Index Document"):
-            files = {'file': (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
-            with st.spinner(f"Indexing {uploaded_file.name}..."):
+    if uploaded_files:
+        if st.sidebar.button("Index Documents"):
+            files = [
+                ('files', (f.name, f.getvalue(), f.type)) for f in uploaded_files
+            ]
+            with st.spinner(f"Indexing {len(uploaded_files)} file(s)..."):
                 try:
                     response = requests.post(INGEST_ENDPOINT, files=files, timeout=120)
                     response.raise_for_status()